@@ -71,28 +71,33 @@ def run_scraper(args):
     pdialog = kodi.ProgressDialog()
     
     settings = ScraperSettings.from_settings_dict(args.get_settings())
+    scraper = GoogleImageSearch()
+    scraper.set_thumbnail_prefetch(settings)
     scraper_strategy = ScrapeStrategy(
         args.get_webserver_host(),
         args.get_webserver_port(),
         settings,
-        GoogleImageSearch(),
+        scraper,
         pdialog)
                   
-    if args.get_entity_type() == constants.OBJ_ROM:
-        scraped_rom = scraper_strategy.process_single_rom(args.get_entity_id())
-        pdialog.endProgress()
-        pdialog.startProgress('Saving ROM in database ...')
-        scraper_strategy.store_scraped_rom(args.get_akl_addon_id(), args.get_entity_id(), scraped_rom)
-        pdialog.endProgress()
-    else:
-        scraped_roms = scraper_strategy.process_roms(args.get_entity_type(), args.get_entity_id())
-        pdialog.endProgress()
-        pdialog.startProgress('Saving ROMs in database ...')
-        scraper_strategy.store_scraped_roms(args.get_akl_addon_id(),
-                                            args.get_entity_type(),
-                                            args.get_entity_id(),
-                                            scraped_roms)
-        pdialog.endProgress()
+    try:
+        if args.get_entity_type() == constants.OBJ_ROM:
+            scraped_rom = scraper_strategy.process_single_rom(args.get_entity_id())
+            pdialog.endProgress()
+            pdialog.startProgress('Saving ROM in database ...')
+            scraper_strategy.store_scraped_rom(args.get_akl_addon_id(), args.get_entity_id(), scraped_rom)
+            pdialog.endProgress()
+        else:
+            scraped_roms = scraper_strategy.process_roms(args.get_entity_type(), args.get_entity_id())
+            pdialog.endProgress()
+            pdialog.startProgress('Saving ROMs in database ...')
+            scraper_strategy.store_scraped_roms(args.get_akl_addon_id(),
+                                                args.get_entity_type(),
+                                                args.get_entity_id(),
+                                                scraped_roms)
+            pdialog.endProgress()
+    finally:
+        scraper.close_thumbnail_cache()
         
 
 # ---------------------------------------------------------------------------------------------
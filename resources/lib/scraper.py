@@ -25,9 +25,12 @@ from urllib.parse import quote_plus
 # --- AKL packages ---
 from akl import constants, settings
 from akl.utils import io, net, kodi
-from akl.scrapers import Scraper
+from akl.scrapers import Scraper, ScraperSettings
 from akl.api import ROMObj
 
+# --- Local modules ---
+from resources.lib.thumbnails import ThumbnailCache
+
 
 # ------------------------------------------------------------------------------------------------
 # Google image search: simple free search
@@ -54,6 +57,14 @@ class GoogleImageSearch(Scraper):
         
         super(GoogleImageSearch, self).__init__(cache_dir)
 
+        # --- Thumbnail cache, only available together with the disk cache ---
+        self.prefetch_thumbnails = False
+        self.thumbnail_cache = None
+        if self.supports_disk_cache() and cache_dir is not None and cache_dir.exists():
+            thumbs_dir = cache_dir.pjoin('thumbs/', isdir=True)
+            thumbs_max_entries = settings.getSettingAsInt('thumbnail_cache_size')
+            self.thumbnail_cache = ThumbnailCache(thumbs_dir, thumbs_max_entries)
+
     # --- Base class abstract methods ------------------------------------------------------------
     def get_name(self):
         return 'Google Image Search'
@@ -82,6 +93,20 @@ class GoogleImageSearch(Scraper):
     def check_before_scraping(self, status_dic):
         return
 
+    # Download the asset thumbnails into the local thumbnail cache before returning the
+    # asset list. Only useful when the user selects the assets manually.
+    def set_thumbnail_prefetch(self, scraper_settings: ScraperSettings):
+        self.prefetch_thumbnails = scraper_settings.asset_selection_mode == constants.SCRAPE_MANUAL
+
+    # Stop background thumbnail downloads. Call when done scraping.
+    def close_thumbnail_cache(self):
+        if self.thumbnail_cache is None:
+            return
+        try:
+            self.thumbnail_cache.close()
+        except Exception:
+            self.logger.exception('Error while closing thumbnail cache.')
+
     def get_candidates(self, search_term: str, rom: ROMObj, platform, status_dic):
         # --- If scraper is disabled return immediately and silently ---
         if self.scraper_disabled:
@@ -117,7 +142,8 @@ class GoogleImageSearch(Scraper):
         # --- Cache hit ---
         if self._check_disk_cache(Scraper.CACHE_INTERNAL, asset_specific_cache_key):
             self.logger.debug(f'Internal cache hit "{asset_specific_cache_key}"')
-            return self._retrieve_from_disk_cache(Scraper.CACHE_INTERNAL, asset_specific_cache_key)
+            asset_list = self._retrieve_from_disk_cache(Scraper.CACHE_INTERNAL, asset_specific_cache_key)
+            return self._prefetch_thumbnails(asset_list)
 
         # --- Cache miss. Retrieve data and update cache ---
         self.logger.debug(f'Internal cache miss "{asset_specific_cache_key}"')
@@ -140,7 +166,7 @@ class GoogleImageSearch(Scraper):
         # --- Put metadata in the cache ---
         self.logger.debug(f'Adding to internal cache "{asset_specific_cache_key}"')
         self._update_disk_cache(Scraper.CACHE_INTERNAL, asset_specific_cache_key, asset_list)
-        return asset_list
+        return self._prefetch_thumbnails(asset_list)
 
     # GoogleImageSearch returns both the asset thumbnail URL and the full resolution URL so in
     # this scraper this method is trivial.
@@ -270,6 +296,17 @@ class GoogleImageSearch(Scraper):
         )
         return asset_list
 
+    # The disk cache keeps the remote thumbnail URLs, local paths are only handed out
+    # to the caller since cached thumbnails can be evicted.
+    def _prefetch_thumbnails(self, asset_list):
+        if not self.prefetch_thumbnails or self.thumbnail_cache is None or not asset_list:
+            return asset_list
+        try:
+            return self.thumbnail_cache.prefetch(asset_list)
+        except Exception:
+            self.logger.exception('Error while prefetching thumbnails.')
+            return asset_list
+
     # Google URLs have the API key and searchengine id.
     # Clean URLs for safe logging.
     def _clean_URL_for_log(self, url):
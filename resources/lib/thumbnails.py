@@ -0,0 +1,289 @@
+# -*- coding: utf-8 -*-
+#
+# Local thumbnail cache for the Googlesearch scraper.
+
+# Copyright (c) 2020-2021 Chrisism
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; version 2 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+
+# --- Python standard library ---
+from __future__ import unicode_literals
+from __future__ import division
+
+import logging
+import json
+import hashlib
+import threading
+import time
+from concurrent import futures
+
+# --- Kodi stuff ---
+import xbmc
+import xbmcvfs
+
+# --- AKL packages ---
+from akl.utils import io, net
+
+
+# ------------------------------------------------------------------------------------------------
+# Thumbnail cache
+#
+# Downloads the thumbnails of an asset list concurrently into a local directory so the
+# manual selection dialog does not have to load every remote thumbnail one by one.
+# The cache is bounded by number of files, least recently used thumbnails are removed first.
+# ------------------------------------------------------------------------------------------------
+class ThumbnailCache(object):
+
+    INDEX_FILENAME = 'thumbs_index.json'
+    MAX_WORKERS = 8
+    # Seconds to wait for the prefetch before handing over the list to the dialog.
+    # Kept short, thumbnails which are not ready yet are shown from their remote URL.
+    PREFETCH_TIMEOUT = 1
+    # Seconds after which a cached thumbnail is refreshed in the background.
+    STALE_AFTER = 7 * 24 * 60 * 60
+
+    # --- Constructor ----------------------------------------------------------------------------
+    def __init__(self, thumbs_dir: io.FileName, max_entries: int):
+        self.logger = logging.getLogger(__name__)
+
+        self.thumbs_dir = thumbs_dir
+        self.max_entries = max_entries
+        self.index_file = self.thumbs_dir.pjoin(ThumbnailCache.INDEX_FILENAME)
+
+        self.lock = threading.Lock()
+        self.pending = {}
+        self.executor = None
+        self.index = None
+        self.closed = False
+        self.disabled = False
+
+    # Returns a copy of the asset list with url_thumb pointing to the local thumbnail
+    # where available. Thumbnails not downloaded within the prefetch timeout keep their
+    # remote URL and are stored in the cache in the background.
+    # When the cache cannot be read or written the asset list is returned unchanged.
+    def prefetch(self, asset_list):
+        if not self._load_index():
+            return asset_list
+
+        now = time.time()
+        list_keys = set()
+        waiting = []
+        for asset in asset_list:
+            url = asset.get('url_thumb')
+            if not url:
+                continue
+            key = self._get_key(url)
+            if key in list_keys:
+                continue
+            list_keys.add(key)
+
+            with self.lock:
+                entry = self.index.get(key)
+            if entry and not self._get_thumb_file(key).exists():
+                self.logger.debug(f'Cached thumbnail {key} is missing. Fetching it again.')
+                with self.lock:
+                    self.index.pop(key, None)
+                entry = None
+
+            if entry is None:
+                future = self._submit(key, url)
+                if future:
+                    waiting.append(future)
+            else:
+                entry['accessed'] = now
+                if now - entry['fetched'] > ThumbnailCache.STALE_AFTER:
+                    # Stale thumbnail is used as is and refreshed without blocking the list.
+                    self._submit(key, url)
+
+        if waiting:
+            self.logger.debug(f'Prefetching {len(waiting)} thumbnails')
+            futures.wait(waiting, timeout=ThumbnailCache.PREFETCH_TIMEOUT)
+
+        # Evict before handing out paths, thumbnails of this list are never evicted.
+        self._evict(list_keys)
+
+        prefetched_list = []
+        for asset in asset_list:
+            url = asset.get('url_thumb')
+            local_path = self._get_local_path(url) if url else None
+            if local_path:
+                asset = dict(asset, url_thumb=local_path)
+            prefetched_list.append(asset)
+
+        if not self._save_index():
+            return asset_list
+        return prefetched_list
+
+    # Blocks until the background downloads submitted so far are finished.
+    def wait(self, timeout=None):
+        with self.lock:
+            pending = list(self.pending.values())
+        if pending:
+            futures.wait(pending, timeout=timeout)
+
+    # Stops the background downloads which have not started yet and stores the index.
+    def close(self):
+        with self.lock:
+            if self.closed:
+                return
+            self.closed = True
+            for future in self.pending.values():
+                future.cancel()
+            executor = self.executor
+            self.executor = None
+
+        if executor is not None:
+            executor.shutdown(wait=False)
+        if self.index is not None and not self.disabled:
+            self._save_index()
+
+    # --- Internal methods -----------------------------------------------------------------------
+    def _get_key(self, url):
+        return hashlib.sha1(url.encode('utf-8')).hexdigest()
+
+    def _get_thumb_file(self, key):
+        return self.thumbs_dir.pjoin(f'{key}.jpg')
+
+    def _get_local_path(self, url):
+        key = self._get_key(url)
+        with self.lock:
+            if key not in self.index:
+                return None
+        return self._get_thumb_file(key).getPath()
+
+    def _submit(self, key, url):
+        with self.lock:
+            if self.closed:
+                return None
+            if key in self.pending:
+                return self.pending[key]
+            if self.executor is None:
+                self.executor = futures.ThreadPoolExecutor(max_workers=ThumbnailCache.MAX_WORKERS)
+            future = self.executor.submit(self._download, key, url)
+            self.pending[key] = future
+            return future
+
+    # Downloads into a temporary file first so a thumbnail shown by the dialog is only
+    # replaced by a complete download.
+    def _download(self, key, url):
+        thumb_file = self._get_thumb_file(key)
+        tmp_file = self.thumbs_dir.pjoin(f'{key}.tmp')
+        try:
+            if xbmc.Monitor().abortRequested():
+                return
+
+            if tmp_file.exists():
+                tmp_file.unlink()
+            net.download_img(url, tmp_file)
+            if not tmp_file.exists():
+                self.logger.debug(f'Thumbnail {url} could not be downloaded')
+                return
+
+            with self.lock:
+                if self.closed:
+                    # Index is already stored, do not leave untracked files behind.
+                    tmp_file.unlink()
+                    return
+                # Cache dir can be a VFS path, so swap the files through the Kodi VFS.
+                if thumb_file.exists():
+                    thumb_file.unlink()
+                if not xbmcvfs.rename(tmp_file.getPath(), thumb_file.getPath()):
+                    self.logger.warning(f'Could not store thumbnail {thumb_file.getPath()}')
+                    tmp_file.unlink()
+                    self.index.pop(key, None)
+                    return
+                now = time.time()
+                self.index[key] = {'fetched': now, 'accessed': now}
+        except Exception:
+            self.logger.exception(f'Error while downloading thumbnail {url}')
+            with self.lock:
+                self.index.pop(key, None)
+            try:
+                if tmp_file.exists():
+                    tmp_file.unlink()
+            except Exception:
+                self.logger.warning(f'Could not remove temporary thumbnail {tmp_file.getPath()}')
+        finally:
+            with self.lock:
+                self.pending.pop(key, None)
+
+    # Removes least recently used thumbnails until the cache fits in max_entries.
+    # Thumbnails in protected_keys or still being downloaded are kept.
+    def _evict(self, protected_keys):
+        with self.lock:
+            overflow = len(self.index) - self.max_entries
+            if overflow <= 0:
+                return
+
+            candidates = [k for k in self.index if k not in protected_keys and k not in self.pending]
+            lru_keys = sorted(candidates, key=lambda k: self.index[k]['accessed'])[:overflow]
+            for key in lru_keys:
+                del self.index[key]
+
+        for key in lru_keys:
+            thumb_file = self._get_thumb_file(key)
+            try:
+                if thumb_file.exists():
+                    thumb_file.unlink()
+            except Exception:
+                self.logger.warning(f'Could not remove cached thumbnail {thumb_file.getPath()}')
+
+    # Loads the index once. Returns False when the cache is not usable, in that case the
+    # cache is disabled for the rest of the session.
+    def _load_index(self):
+        if self.disabled:
+            return False
+        if self.index is not None:
+            return True
+
+        try:
+            if not self.thumbs_dir.exists():
+                self.thumbs_dir.makedirs()
+            index = {}
+            if self.index_file.exists():
+                index = json.loads(self.index_file.loadFileToStr())
+            if not self._is_valid_index(index):
+                raise ValueError('Unexpected thumbnail cache index format')
+        except Exception:
+            self.logger.exception('Cannot load thumbnail cache index. Disabling thumbnail cache.')
+            self.disabled = True
+            try:
+                # Start with a clean index next session.
+                if self.index_file.exists():
+                    self.index_file.unlink()
+            except Exception:
+                self.logger.warning(f'Could not remove thumbnail cache index {self.index_file.getPath()}')
+            return False
+
+        self.index = index
+        return True
+
+    def _is_valid_index(self, index):
+        if not isinstance(index, dict):
+            return False
+        for entry in index.values():
+            if not isinstance(entry, dict):
+                return False
+            if not isinstance(entry.get('fetched'), (int, float)):
+                return False
+            if not isinstance(entry.get('accessed'), (int, float)):
+                return False
+        return True
+
+    def _save_index(self):
+        with self.lock:
+            index_str = json.dumps(self.index)
+        try:
+            self.index_file.saveStrToFile(index_str)
+        except Exception:
+            self.logger.exception('Cannot store thumbnail cache index. Disabling thumbnail cache.')
+            self.disabled = True
+            return False
+        return True
@@ -67,6 +67,26 @@ class FakeFile(io.FileName):
     def scanFilesInPathAsFileNameObjects(self, mask = '*.*'):
         return []
     
+class FakeDiskFile(FakeFile):
+    """FakeFile which keeps track of existing files in a shared dictionary."""
+
+    def __init__(self, pathString: str, disk: dict = None, isdir: bool = False):
+        super(FakeDiskFile, self).__init__(pathString, isdir)
+        self.disk = disk if disk is not None else {}
+        self.exists = self.exists_on_disk
+
+    def exists_on_disk(self):
+        return self.is_a_dir or self.path_str in self.disk
+
+    def loadFileToStr(self, encoding = 'utf-8'):
+        return self.disk[self.path_str]
+
+    def saveStrToFile(self, data_str, encoding = 'utf-8'):
+        self.disk[self.path_str] = data_str
+
+    def pjoin(self, path_str, isdir = False):
+        return FakeDiskFile(os.path.join(self.path_str, path_str), self.disk, isdir)
+    
 class FakeExecutor(ExecutorABC):
     
     def __init__(self):
@@ -5,13 +5,14 @@ from unittest.mock import MagicMock, patch
 import json
 import logging
 
-from tests.fakes import FakeProgressDialog, random_string, FakeFile
+from tests.fakes import FakeProgressDialog, random_string, FakeFile, FakeDiskFile
 
 logging.basicConfig(format = '%(asctime)s %(module)s %(levelname)s: %(message)s',
                 datefmt = '%m/%d/%Y %I:%M:%S %p', level = logging.DEBUG)
 logger = logging.getLogger(__name__)
 
 from resources.lib.scraper import GoogleImageSearch
+from resources.lib.thumbnails import ThumbnailCache
 from akl.scrapers import ScrapeStrategy, ScraperSettings
 
 from akl.api import ROMObj
@@ -52,6 +53,7 @@ class Test_google_scrapers(unittest.TestCase):
         print('TEST ASSETS DIR: {}'.format(cls.TEST_ASSETS_DIR))
         print('---------------------------------------------------------------------------')
 
+    @patch('akl.scrapers.settings.getSettingAsInt', autospec=True, return_value=500)
     @patch('akl.scrapers.kodi.getAddonDir', autospec=True, return_value=FakeFile("/test"))
     @patch('akl.scrapers.settings.getSettingAsFilePath', autospec=True, return_value=FakeFile("/test"))
     @patch('resources.lib.scraper.net.get_URL_as_json', side_effect = mocked_google)
@@ -59,7 +61,7 @@ class Test_google_scrapers(unittest.TestCase):
     @patch('resources.lib.scraper.io.FileName.scanFilesInPath', autospec=True)
     @patch('akl.api.client_get_rom')
     def test_scraping_assets_for_game(self, api_rom_mock: MagicMock, scanner_mock, 
-        mock_img_downloader, mock_url_downloader, settings_file, addon_dir):    
+        mock_img_downloader, mock_url_downloader, settings_file, addon_dir, settings_int):    
         # arrange
         settings = ScraperSettings()
         settings.scrape_metadata_policy = constants.SCRAPE_ACTION_NONE
@@ -96,13 +98,14 @@ class Test_google_scrapers(unittest.TestCase):
         
         self.assertTrue(actual.entity_data['assets'][constants.ASSET_BOXFRONT_ID], 'No front defined')
         
+    @patch('akl.scrapers.settings.getSettingAsInt', autospec=True, return_value=500)
     @patch('akl.scrapers.kodi.getAddonDir', autospec=True, return_value=FakeFile("/test"))
     @patch('akl.scrapers.settings.getSettingAsFilePath', autospec=True, return_value=FakeFile("/test"))
     @patch('resources.lib.scraper.net.get_URL_as_json', side_effect = mocked_google)
     @patch('resources.lib.scraper.io.FileName.scanFilesInPath', autospec=True)
     @patch('akl.api.client_get_rom')
     def test_scraping_trailer_assets_for_game(self, api_rom_mock: MagicMock, scanner_mock, 
-        mock_img_downloader, settings_file, addon_dir): 
+        mock_img_downloader, settings_file, addon_dir, settings_int): 
         # arrange
         settings = ScraperSettings()
         settings.scrape_metadata_policy = constants.SCRAPE_ACTION_NONE
@@ -137,7 +140,8 @@ class Test_google_scrapers(unittest.TestCase):
         self.assertTrue(actual) 
         logger.info(actual.get_data_dic()) 
         
-    def test_cleaning_url(self):    
+    @patch('akl.scrapers.settings.getSettingAsInt', autospec=True, return_value=500)
+    def test_cleaning_url(self, settings_int):    
         # arrange
         target = GoogleImageSearch()
         url = "https://customsearch.googleapis.com/customsearch/v1?cx=ABC&q=test&searchType=image&key=Q9Q9&start=1"
@@ -147,4 +151,64 @@ class Test_google_scrapers(unittest.TestCase):
         actual = target._clean_URL_for_log(url)
 
         # assert
-        assert expected == actual
\ No newline at end of file
+        assert expected == actual
+
+    def create_scraper_for_assets(self, disk: dict):
+        target = GoogleImageSearch()
+        target.candidate = target._search_candidates('castlevania', 'Nintendo NES', {'status': True})[0]
+        target.cache_key = 'castlevania'
+        target.thumbnail_cache = ThumbnailCache(FakeDiskFile('/test/thumbs/', disk, isdir=True), 500)
+        return target
+
+    @patch('akl.scrapers.settings.getSettingAsInt', autospec=True, return_value=500)
+    @patch('resources.lib.thumbnails.xbmc.Monitor')
+    @patch('resources.lib.thumbnails.xbmcvfs.rename')
+    @patch('resources.lib.thumbnails.net.download_img')
+    @patch('resources.lib.scraper.net.get_URL_as_json', side_effect = mocked_google)
+    def test_getting_assets_with_thumbnail_prefetch(self, mock_url_downloader, mock_img_downloader, 
+        mock_rename, mock_monitor, settings_int):
+        # arrange
+        disk = {}
+        mock_img_downloader.side_effect = lambda url, file_path: disk.update({file_path.getPath(): url})
+        mock_rename.side_effect = lambda src, dst: disk.update({dst: disk.pop(src)}) or True
+        mock_monitor.return_value.abortRequested.return_value = False
+        settings = ScraperSettings()
+        settings.asset_selection_mode = constants.SCRAPE_MANUAL
+
+        target = self.create_scraper_for_assets(disk)
+        target.set_thumbnail_prefetch(settings)
+        target._check_disk_cache = MagicMock(return_value=False)
+        target._update_disk_cache = MagicMock()
+
+        # act
+        actual = target.get_assets(constants.ASSET_BOXFRONT_ID, {'status': True, 'dialog': None, 'msg': ''})
+
+        # assert
+        self.assertTrue(target.prefetch_thumbnails)
+        self.assertTrue(actual)
+        self.assertTrue(all(a['url_thumb'] in disk for a in actual))
+        
+        cached_assets = target._update_disk_cache.call_args[0][2]
+        self.assertTrue(all(a['url_thumb'].startswith('https://') for a in cached_assets))
+
+    @patch('akl.scrapers.settings.getSettingAsInt', autospec=True, return_value=500)
+    @patch('resources.lib.thumbnails.net.download_img')
+    @patch('resources.lib.scraper.net.get_URL_as_json', side_effect = mocked_google)
+    def test_getting_assets_without_thumbnail_prefetch(self, mock_url_downloader, mock_img_downloader, settings_int):
+        # arrange
+        settings = ScraperSettings()
+        settings.asset_selection_mode = constants.SCRAPE_AUTOMATIC
+
+        target = self.create_scraper_for_assets({})
+        target.set_thumbnail_prefetch(settings)
+        target._check_disk_cache = MagicMock(return_value=False)
+        target._update_disk_cache = MagicMock()
+
+        # act
+        actual = target.get_assets(constants.ASSET_BOXFRONT_ID, {'status': True, 'dialog': None, 'msg': ''})
+
+        # assert
+        self.assertFalse(target.prefetch_thumbnails)
+        self.assertTrue(actual)
+        self.assertTrue(all(a['url_thumb'].startswith('https://') for a in actual))
+        mock_img_downloader.assert_not_called()
@@ -0,0 +1,304 @@
+import unittest
+import unittest.mock
+from unittest.mock import MagicMock, patch
+
+import logging
+import threading
+import time
+
+from tests.fakes import FakeDiskFile
+
+logging.basicConfig(format = '%(asctime)s %(module)s %(levelname)s: %(message)s',
+                datefmt = '%m/%d/%Y %I:%M:%S %p', level = logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+from resources.lib.thumbnails import ThumbnailCache
+
+def create_assets(amount: int, offset: int = 0):
+    return [{
+        'asset_ID': 'boxfront',
+        'display_name': f'Result {i}',
+        'url_thumb': f'https://encrypted-tbn0.gstatic.com/images?q=tbn:{i}',
+        'url': f'https://example.com/image_{i}.jpg'
+    } for i in range(offset, offset + amount)]
+
+def fake_download(url, file_path):
+    file_path.disk[file_path.path_str] = url
+
+def fake_unlink(file_path):
+    file_path.disk.pop(file_path.path_str, None)
+
+class Test_thumbnail_cache(unittest.TestCase):
+
+    def setUp(self):
+        self.disk = {}
+        self.thumbs_dir = FakeDiskFile('/thumbs/', self.disk, isdir=True)
+
+        def fake_rename(src, dst):
+            self.disk[dst] = self.disk.pop(src)
+            return True
+
+        patchers = [
+            patch('resources.lib.thumbnails.xbmcvfs.rename', side_effect=fake_rename),
+            patch('resources.lib.thumbnails.io.FileName.unlink', autospec=True, side_effect=fake_unlink),
+            patch('resources.lib.thumbnails.xbmc.Monitor')
+        ]
+        mocks = [p.start() for p in patchers]
+        for p in patchers:
+            self.addCleanup(p.stop)
+        self.mock_rename, self.mock_unlink, mock_monitor = mocks
+        mock_monitor.return_value.abortRequested.return_value = False
+
+    def local_paths(self, asset_list):
+        return [a['url_thumb'] for a in asset_list if a['url_thumb'].startswith('/thumbs/')]
+
+    @patch('resources.lib.thumbnails.net.download_img', side_effect=fake_download)
+    def test_prefetching_thumbnails_returns_local_paths(self, mock_img_downloader: MagicMock):
+        # arrange
+        assets = create_assets(5)
+        target = ThumbnailCache(self.thumbs_dir, 100)
+
+        # act
+        actual = target.prefetch(assets)
+
+        # assert
+        self.assertEqual(5, mock_img_downloader.call_count)
+        for asset, prefetched in zip(assets, actual):
+            self.assertTrue(prefetched['url_thumb'].startswith('/thumbs/'))
+            self.assertTrue(prefetched['url_thumb'] in self.disk, 'Thumbnail file not stored')
+            self.assertEqual(asset['url'], prefetched['url'])
+            self.assertTrue(asset['url_thumb'].startswith('https://'), 'Original asset list changed')
+        self.assertFalse([p for p in self.disk if p.endswith('.tmp')], 'Temporary files left behind')
+
+    @patch('resources.lib.thumbnails.net.download_img', side_effect=fake_download)
+    def test_prefetching_cached_thumbnails_does_not_download_again(self, mock_img_downloader: MagicMock):
+        # arrange
+        assets = create_assets(3)
+        target = ThumbnailCache(self.thumbs_dir, 100)
+        target.prefetch(assets)
+        mock_img_downloader.reset_mock()
+
+        # act
+        actual = target.prefetch(assets)
+
+        # assert
+        mock_img_downloader.assert_not_called()
+        self.assertEqual(3, len(self.local_paths(actual)))
+
+    @patch('resources.lib.thumbnails.net.download_img', side_effect=fake_download)
+    def test_missing_thumbnail_file_is_fetched_again(self, mock_img_downloader: MagicMock):
+        # arrange
+        assets = create_assets(3)
+        target = ThumbnailCache(self.thumbs_dir, 100)
+        first = target.prefetch(assets)
+        del self.disk[first[0]['url_thumb']]
+        mock_img_downloader.reset_mock()
+
+        # act
+        actual = target.prefetch(assets)
+
+        # assert
+        self.assertEqual(1, mock_img_downloader.call_count)
+        self.assertTrue(actual[0]['url_thumb'] in self.disk)
+
+    @patch('resources.lib.thumbnails.ThumbnailCache.PREFETCH_TIMEOUT', 0.1)
+    @patch('resources.lib.thumbnails.net.download_img')
+    def test_slow_thumbnails_keep_remote_url_and_finish_in_background(self, mock_img_downloader: MagicMock):
+        # arrange
+        release = threading.Event()
+        def slow_download(url, file_path):
+            release.wait(5)
+            fake_download(url, file_path)
+        mock_img_downloader.side_effect = slow_download
+
+        assets = create_assets(2)
+        target = ThumbnailCache(self.thumbs_dir, 100)
+
+        # act
+        actual = target.prefetch(assets)
+        release.set()
+        target.wait()
+
+        # assert
+        self.assertEqual([a['url_thumb'] for a in assets], [a['url_thumb'] for a in actual])
+        self.assertEqual(2, len(target.index))
+        self.assertEqual(2, len(self.local_paths(target.prefetch(assets))))
+
+    @patch('resources.lib.thumbnails.net.download_img', side_effect=fake_download)
+    def test_stale_thumbnails_are_used_and_refreshed(self, mock_img_downloader: MagicMock):
+        # arrange
+        assets = create_assets(1)
+        target = ThumbnailCache(self.thumbs_dir, 100)
+        target.prefetch(assets)
+        key = next(iter(target.index))
+        stale_time = time.time() - ThumbnailCache.STALE_AFTER - 1
+        target.index[key]['fetched'] = stale_time
+        mock_img_downloader.reset_mock()
+
+        # act
+        actual = target.prefetch(assets)
+        target.wait()
+
+        # assert
+        self.assertEqual(1, len(self.local_paths(actual)))
+        self.assertEqual(1, mock_img_downloader.call_count)
+        self.assertGreater(target.index[key]['fetched'], stale_time)
+
+    @patch('resources.lib.thumbnails.net.download_img')
+    def test_failed_download_is_not_added_to_index(self, mock_img_downloader: MagicMock):
+        # arrange
+        assets = create_assets(2)
+        target = ThumbnailCache(self.thumbs_dir, 100)
+
+        # act
+        actual = target.prefetch(assets)
+
+        # assert
+        self.assertEqual(2, mock_img_downloader.call_count)
+        self.assertEqual({}, target.index)
+        self.assertEqual([], self.local_paths(actual))
+        self.mock_rename.assert_not_called()
+
+    @patch('resources.lib.thumbnails.net.download_img')
+    def test_failed_stale_refresh_keeps_old_thumbnail_stale(self, mock_img_downloader: MagicMock):
+        # arrange
+        assets = create_assets(1)
+        target = ThumbnailCache(self.thumbs_dir, 100)
+        mock_img_downloader.side_effect = fake_download
+        target.prefetch(assets)
+        key = next(iter(target.index))
+        stale_time = time.time() - ThumbnailCache.STALE_AFTER - 1
+        target.index[key]['fetched'] = stale_time
+        mock_img_downloader.side_effect = None
+
+        # act
+        actual = target.prefetch(assets)
+        target.wait()
+
+        # assert
+        self.assertEqual(1, len(self.local_paths(actual)))
+        self.assertTrue(actual[0]['url_thumb'] in self.disk)
+        self.assertEqual(stale_time, target.index[key]['fetched'])
+
+    @patch('resources.lib.thumbnails.net.download_img', side_effect=fake_download)
+    def test_thumbnail_cache_is_bounded(self, mock_img_downloader: MagicMock):
+        # arrange
+        target = ThumbnailCache(self.thumbs_dir, 4)
+        target.prefetch(create_assets(4))
+
+        # act
+        actual = target.prefetch(create_assets(3, offset=10))
+
+        # assert
+        self.assertEqual(4, len(target.index))
+        self.assertEqual(3, self.mock_unlink.call_count)
+        self.assertEqual(3, len(self.local_paths(actual)))
+        for asset in actual:
+            self.assertTrue(asset['url_thumb'] in self.disk)
+
+    @patch('resources.lib.thumbnails.net.download_img', side_effect=fake_download)
+    def test_thumbnails_of_current_list_are_never_evicted(self, mock_img_downloader: MagicMock):
+        # arrange
+        target = ThumbnailCache(self.thumbs_dir, 4)
+
+        # act
+        actual = target.prefetch(create_assets(10))
+
+        # assert
+        self.mock_unlink.assert_not_called()
+        self.assertEqual(10, len(self.local_paths(actual)))
+        for asset in actual:
+            self.assertTrue(asset['url_thumb'] in self.disk)
+
+    @patch('resources.lib.thumbnails.net.download_img', side_effect=fake_download)
+    def test_index_is_written_once_per_prefetch(self, mock_img_downloader: MagicMock):
+        # arrange
+        target = ThumbnailCache(self.thumbs_dir, 100)
+
+        # act
+        with patch.object(FakeDiskFile, 'saveStrToFile', autospec=True) as mock_save:
+            target.prefetch(create_assets(10))
+
+        # assert
+        self.assertEqual(1, mock_save.call_count)
+
+    @patch('resources.lib.thumbnails.net.download_img', side_effect=fake_download)
+    def test_closing_cache_stops_prefetching(self, mock_img_downloader: MagicMock):
+        # arrange
+        target = ThumbnailCache(self.thumbs_dir, 100)
+        target.prefetch(create_assets(1))
+
+        # act
+        target.close()
+        actual = target.prefetch(create_assets(2, offset=5))
+
+        # assert
+        self.assertEqual(1, mock_img_downloader.call_count)
+        self.assertIsNone(target.executor)
+        self.assertEqual([], self.local_paths(actual))
+
+    def assert_remote_urls(self, assets, actual):
+        self.assertEqual([a['url_thumb'] for a in assets], [a['url_thumb'] for a in actual])
+
+    @patch('resources.lib.thumbnails.net.download_img', side_effect=fake_download)
+    def test_failing_index_write_returns_remote_urls(self, mock_img_downloader: MagicMock):
+        # arrange
+        assets = create_assets(3)
+        target = ThumbnailCache(self.thumbs_dir, 100)
+
+        # act
+        with patch.object(FakeDiskFile, 'saveStrToFile', autospec=True, side_effect=OSError('Read-only')):
+            actual = target.prefetch(assets)
+        target.close()
+
+        # assert
+        self.assert_remote_urls(assets, actual)
+        self.assertTrue(target.disabled)
+
+    @patch('resources.lib.thumbnails.net.download_img', side_effect=fake_download)
+    def test_unreadable_index_returns_remote_urls(self, mock_img_downloader: MagicMock):
+        # arrange
+        assets = create_assets(3)
+        self.disk['/thumbs/thumbs_index.json'] = '{}'
+        target = ThumbnailCache(self.thumbs_dir, 100)
+
+        # act
+        with patch.object(FakeDiskFile, 'loadFileToStr', autospec=True, side_effect=OSError('VFS error')):
+            actual = target.prefetch(assets)
+
+        # assert
+        self.assert_remote_urls(assets, actual)
+        mock_img_downloader.assert_not_called()
+
+    @patch('resources.lib.thumbnails.net.download_img', side_effect=fake_download)
+    def test_index_with_wrong_shape_returns_remote_urls(self, mock_img_downloader: MagicMock):
+        for index_str in ['[]', '{"abc": []}', '{"abc": {"accessed": 1}}', 'not json']:
+            # arrange
+            assets = create_assets(3)
+            self.disk['/thumbs/thumbs_index.json'] = index_str
+            target = ThumbnailCache(self.thumbs_dir, 100)
+
+            # act
+            actual = target.prefetch(assets)
+
+            # assert
+            self.assert_remote_urls(assets, actual)
+            self.assertFalse('/thumbs/thumbs_index.json' in self.disk, 'Broken index not removed')
+        mock_img_downloader.assert_not_called()
+
+    @patch('resources.lib.thumbnails.net.download_img', side_effect=fake_download)
+    def test_failing_rename_returns_remote_urls(self, mock_img_downloader: MagicMock):
+        for rename_effect in [lambda src, dst: False, OSError('Rename failed')]:
+            # arrange
+            assets = create_assets(3)
+            self.mock_rename.side_effect = rename_effect
+            target = ThumbnailCache(self.thumbs_dir, 100)
+
+            # act
+            actual = target.prefetch(assets)
+
+            # assert
+            self.assert_remote_urls(assets, actual)
+            self.assertEqual({}, target.index)
+            self.assertFalse([p for p in self.disk if p.endswith('.tmp')], 'Temporary files left behind')
+